@@ -0,0 +1,50 @@
+import sqlite3
+
+from flask import Flask
+from flask_caching import Cache
+from flask_compress import Compress
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import Config
+
+# expire_on_commit=False: handlers read attributes for the JSON/flash
+# response after their single commit; default expiry would re-SELECT
+# every touched row at that point.
+db = SQLAlchemy(session_options={'expire_on_commit': False})
+cache = Cache()
+compress = Compress()
+
+
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ships with foreign_keys=OFF; without the pragma the
+    # ON DELETE CASCADE/SET NULL actions on the part FKs silently do
+    # nothing and part deletes leave orphaned child rows.
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
+def create_app(config_class=Config):
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+
+    from app.json_provider import ORJSONProvider
+    app.json = ORJSONProvider(app)
+
+    db.init_app(app)
+    cache.init_app(app)
+    compress.init_app(app)
+
+    from app.routes import (assemblies, components, database, estimates,
+                            health)
+    app.register_blueprint(assemblies.bp, url_prefix='/assemblies')
+    app.register_blueprint(components.bp, url_prefix='/components')
+    app.register_blueprint(database.bp, url_prefix='/database')
+    app.register_blueprint(estimates.bp, url_prefix='/estimates')
+    app.register_blueprint(health.bp, url_prefix='/healthz')
+
+    return app
@@ -0,0 +1,389 @@
+import math
+from datetime import datetime
+
+from app import db
+
+
+class Project(db.Model):
+    __tablename__ = 'projects'
+
+    project_id = db.Column(db.Integer, primary_key=True)
+    project_name = db.Column(db.String(200), nullable=False)
+    client_name = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    estimates = db.relationship('Estimate', backref='project', lazy=True)
+
+
+class Estimate(db.Model):
+    __tablename__ = 'estimates'
+
+    estimate_id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer,
+                           db.ForeignKey('projects.project_id'),
+                           nullable=False)
+    estimate_number = db.Column(db.String(50))
+    estimate_name = db.Column(db.String(200), nullable=False)
+    total_engineering_hours = db.Column(db.Numeric(10, 2), default=0)
+    total_engineering_cost = db.Column(db.Numeric(12, 2), default=0)
+    total_panel_shop_hours = db.Column(db.Numeric(10, 2), default=0)
+    total_panel_shop_cost = db.Column(db.Numeric(12, 2), default=0)
+    total_machine_assembly_hours = db.Column(db.Numeric(10, 2), default=0)
+    total_machine_assembly_cost = db.Column(db.Numeric(12, 2), default=0)
+    # Per-estimate sort counter: assigned with UPDATE ... RETURNING so
+    # concurrent creates never race on a MAX(sort_order) read.
+    next_assembly_sort_order = db.Column(db.Integer, nullable=False,
+                                         default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+
+    # selectin: loading an estimate pulls its assemblies in one IN-list
+    # query instead of a lazy SELECT per attribute access.
+    assemblies = db.relationship('Assembly', back_populates='estimate',
+                                 lazy='selectin',
+                                 order_by='Assembly.sort_order')
+
+
+class Assembly(db.Model):
+    __tablename__ = 'assemblies'
+    # Covers the filter-by-estimate + ORDER BY sort_order pattern used
+    # by manage_hours and the selectin relationship load.
+    __table_args__ = (
+        db.Index('ix_assembly_estimate_sort', 'estimate_id', 'sort_order'),
+    )
+
+    assembly_id = db.Column(db.Integer, primary_key=True)
+    estimate_id = db.Column(db.Integer,
+                            db.ForeignKey('estimates.estimate_id'),
+                            nullable=False)
+    standard_assembly_id = db.Column(
+        db.Integer,
+        db.ForeignKey('standard_assemblies.standard_assembly_id'))
+    assembly_name = db.Column(db.String(200), nullable=False)
+    # Name without the display-only " (xN)" quantity suffix; nullable
+    # for rows created before the column existed.
+    base_name = db.Column(db.String(200))
+    quantity = db.Column(db.Numeric(10, 2), default=1)
+    engineering_hours = db.Column(db.Numeric(10, 2), default=0)
+    panel_shop_hours = db.Column(db.Numeric(10, 2), default=0)
+    machine_assembly_hours = db.Column(db.Numeric(10, 2), default=0)
+    estimated_by = db.Column(db.String(100))
+    time_estimate_notes = db.Column(db.Text)
+    sort_order = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+
+    estimate = db.relationship('Estimate', back_populates='assemblies')
+    # Deliberately lazy: the collection (and each part joined onto it)
+    # is heavy, and most pages never read it. Routes that do opt in
+    # with selectinload.
+    assembly_parts = db.relationship('AssemblyPart',
+                                     back_populates='assembly',
+                                     lazy='select',
+                                     cascade='all, delete-orphan')
+    # Explicit back_populates and an order_by so eager loads (see
+    # detail_estimate's selectinload) arrive sorted; lazy='select', not
+    # 'dynamic', keeps the collection a plain preloadable list.
+    components = db.relationship('Component', back_populates='assembly',
+                                 lazy='select',
+                                 order_by='Component.sort_order',
+                                 cascade='all, delete-orphan')
+    standard_assembly = db.relationship('StandardAssembly', lazy=True)
+
+
+class AssemblyPart(db.Model):
+    __tablename__ = 'assembly_parts'
+    # Covers the bulk DELETE/rescale filters and the component grid's
+    # filter-by-assembly + ORDER BY sort_order in one index.
+    __table_args__ = (
+        db.Index('ix_assembly_part_assembly_sort',
+                 'assembly_id', 'sort_order'),
+    )
+
+    assembly_part_id = db.Column(db.Integer, primary_key=True)
+    assembly_id = db.Column(db.Integer,
+                            db.ForeignKey('assemblies.assembly_id'),
+                            nullable=False)
+    part_id = db.Column(db.Integer,
+                        db.ForeignKey('parts.part_id',
+                                      ondelete='CASCADE'),
+                        nullable=False, index=True)
+    quantity = db.Column(db.Numeric(10, 2), default=1)
+    unit_of_measure = db.Column(db.String(20))
+    sort_order = db.Column(db.Integer, default=0)
+    notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+
+    assembly = db.relationship('Assembly', back_populates='assembly_parts')
+    # joined: the part is consumed on virtually every AssemblyPart read
+    # (serializers, delegating properties below); innerjoin is safe
+    # because part_id is non-nullable.
+    part = db.relationship(
+        'Parts',
+        backref=db.backref('assembly_parts', passive_deletes=True),
+        lazy='joined', innerjoin=True)
+
+    @property
+    def component_name(self):
+        return self.part.model if self.part else None
+
+    @property
+    def description(self):
+        return self.part.description if self.part else None
+
+    @property
+    def part_number(self):
+        return self.part.part_number if self.part else None
+
+    @property
+    def unit_price(self):
+        return self.part.current_price if self.part else None
+
+    @property
+    def total_price(self):
+        price = self.unit_price
+        if price is None:
+            return None
+        return float(self.quantity or 0) * float(price)
+
+
+class Parts(db.Model):
+    __tablename__ = 'parts'
+    __table_args__ = (
+        # Backward scan serves the catalog's ORDER BY updated_at DESC
+        # with no sort; it also backs the MAX(updated_at) validators.
+        db.Index('ix_parts_updated_at', 'updated_at'),
+        # Category listing: equality on category, then the exact
+        # (description, part_number) output order.
+        db.Index('ix_parts_category_desc_pn', 'category', 'description',
+                 'part_number'),
+    )
+
+    part_id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(100))
+    # Indexed: edit_assembly_part's similar-parts lookup filters on it.
+    category_id = db.Column(db.Integer,
+                            db.ForeignKey('assembly_categories.category_id'),
+                            index=True)
+    model = db.Column(db.String(100))
+    rating = db.Column(db.String(100))
+    master_item_number = db.Column(db.String(100))
+    manufacturer = db.Column(db.String(100))
+    part_number = db.Column(db.String(100))
+    upc = db.Column(db.String(50))
+    description = db.Column(db.Text)
+    vendor = db.Column(db.String(100))
+    effective_date = db.Column(db.Date)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+
+    price_history = db.relationship('PartsPriceHistory', backref='part',
+                                    lazy=True, passive_deletes=True)
+
+    @property
+    def current_price(self):
+        current = PartsPriceHistory.query.filter_by(
+            part_id=self.part_id, is_current=True).first()
+        return float(current.new_price) if current else None
+
+    def update_price(self, new_price, reason=None, effective_date=None):
+        old_price = self.current_price
+        # Tolerant compare: float/Decimal round-trips through forms must
+        # not create no-op history rows.
+        if old_price is not None and math.isclose(
+                float(old_price), float(new_price),
+                rel_tol=1e-9, abs_tol=1e-4):
+            return
+        PartsPriceHistory.query.filter_by(
+            part_id=self.part_id, is_current=True).update(
+                {'is_current': False})
+        db.session.add(PartsPriceHistory(
+            part_id=self.part_id,
+            old_price=old_price,
+            new_price=new_price,
+            changed_reason=reason,
+            effective_date=effective_date,
+            is_current=True,
+        ))
+        self.updated_at = datetime.utcnow()
+
+
+class PartsPriceHistory(db.Model):
+    __tablename__ = 'parts_price_history'
+    __table_args__ = (
+        # Partial index: the current-price probes and updates filter on
+        # is_current=true, which matches at most one row per part.
+        db.Index('ix_parts_price_history_current', 'part_id',
+                 postgresql_where=db.text('is_current'),
+                 sqlite_where=db.text('is_current')),
+        # Drives the history read: filter on part_id, order by
+        # changed_at, no sort step.
+        db.Index('ix_parts_price_history_part_changed', 'part_id',
+                 'changed_at'),
+    )
+
+    parts_price_history_id = db.Column(db.Integer, primary_key=True)
+    part_id = db.Column(db.Integer,
+                        db.ForeignKey('parts.part_id',
+                                      ondelete='CASCADE'),
+                        nullable=False)
+    old_price = db.Column(db.Numeric(12, 4))
+    new_price = db.Column(db.Numeric(12, 4), nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    changed_reason = db.Column(db.String(200))
+    effective_date = db.Column(db.Date)
+    is_current = db.Column(db.Boolean, default=False)
+
+
+class Component(db.Model):
+    """Free-form component line attached directly to an assembly."""
+
+    __tablename__ = 'components'
+
+    component_id = db.Column(db.Integer, primary_key=True)
+    assembly_id = db.Column(db.Integer,
+                            db.ForeignKey('assemblies.assembly_id'),
+                            nullable=False)
+    component_name = db.Column(db.String(200))
+    description = db.Column(db.Text)
+    part_number = db.Column(db.String(100))
+    manufacturer = db.Column(db.String(100))
+    category = db.Column(db.String(100))
+    quantity = db.Column(db.Numeric(10, 2), default=1)
+    unit_price = db.Column(db.Numeric(12, 4), default=0)
+    sort_order = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+
+    assembly = db.relationship('Assembly', back_populates='components')
+    price_history = db.relationship('PriceHistory', backref='component',
+                                    lazy=True)
+
+    @property
+    def total_price(self):
+        return float(self.quantity or 0) * float(self.unit_price or 0)
+
+
+class PriceHistory(db.Model):
+    __tablename__ = 'price_history'
+    # Covers price_history_data's filter + ORDER BY changed_at and its
+    # MAX(changed_at) cache stamp.
+    __table_args__ = (
+        db.Index('ix_price_history_component_changed',
+                 'component_id', 'changed_at'),
+    )
+
+    price_history_id = db.Column(db.Integer, primary_key=True)
+    component_id = db.Column(db.Integer,
+                             db.ForeignKey('components.component_id'),
+                             nullable=False)
+    old_price = db.Column(db.Numeric(12, 4))
+    new_price = db.Column(db.Numeric(12, 4), nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    changed_reason = db.Column(db.String(200))
+
+
+class StandardAssembly(db.Model):
+    __tablename__ = 'standard_assemblies'
+
+    standard_assembly_id = db.Column(db.Integer, primary_key=True)
+    base_assembly_id = db.Column(
+        db.Integer,
+        db.ForeignKey('standard_assemblies.standard_assembly_id'))
+    assembly_name = db.Column(db.String(200), nullable=False)
+    # Indexed: delete_category probes this column with EXISTS.
+    category = db.Column(db.String(50), index=True)
+    description = db.Column(db.Text)
+    version = db.Column(db.String(20), default='1.0')
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    components = db.relationship('StandardAssemblyComponent',
+                                 backref='standard_assembly', lazy=True)
+
+
+class StandardAssemblyComponent(db.Model):
+    __tablename__ = 'standard_assembly_components'
+    # Covers the INSERT...SELECT source scan in refresh/change-version.
+    __table_args__ = (
+        db.Index('ix_std_component_standard_sort',
+                 'standard_assembly_id', 'sort_order'),
+    )
+
+    standard_assembly_component_id = db.Column(db.Integer, primary_key=True)
+    standard_assembly_id = db.Column(
+        db.Integer,
+        db.ForeignKey('standard_assemblies.standard_assembly_id'),
+        nullable=False)
+    part_id = db.Column(db.Integer,
+                        db.ForeignKey('parts.part_id',
+                                      ondelete='CASCADE'),
+                        nullable=False, index=True)
+    quantity = db.Column(db.Numeric(10, 2), default=1)
+    unit_of_measure = db.Column(db.String(20))
+    sort_order = db.Column(db.Integer, default=0)
+    notes = db.Column(db.Text)
+
+
+class AssemblyCategory(db.Model):
+    __tablename__ = 'assembly_categories'
+
+    category_id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(50), unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    # DB-side timestamp: immune to worker clock skew and keeps the
+    # column out of the UPDATE parameter payload.
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(),
+                           onupdate=db.func.now())
+
+
+class EstimateComponent(db.Model):
+    __tablename__ = 'estimate_components'
+
+    estimate_component_id = db.Column(db.Integer, primary_key=True)
+    estimate_id = db.Column(db.Integer,
+                            db.ForeignKey('estimates.estimate_id'),
+                            nullable=False)
+    part_id = db.Column(db.Integer,
+                        db.ForeignKey('parts.part_id',
+                                      ondelete='CASCADE'),
+                        nullable=False, index=True)
+    quantity = db.Column(db.Numeric(10, 2), default=1)
+    unit_price = db.Column(db.Numeric(12, 4))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class TechData(db.Model):
+    __tablename__ = 'tech_data'
+
+    tech_data_id = db.Column(db.Integer, primary_key=True)
+    part_id = db.Column(db.Integer,
+                        db.ForeignKey('parts.part_id',
+                                      ondelete='CASCADE'),
+                        nullable=False, index=True)
+    voltage = db.Column(db.String(50))
+    amperage = db.Column(db.String(50))
+    horsepower = db.Column(db.String(50))
+    notes = db.Column(db.Text)
+
+
+class Motor(db.Model):
+    __tablename__ = 'motors'
+
+    motor_id = db.Column(db.Integer, primary_key=True)
+    estimate_id = db.Column(db.Integer,
+                            db.ForeignKey('estimates.estimate_id'))
+    description = db.Column(db.String(200))
+    horsepower = db.Column(db.Numeric(10, 2))
+    selected_vfd_part_id = db.Column(
+        db.Integer,
+        db.ForeignKey('parts.part_id', ondelete='SET NULL'),
+        index=True)
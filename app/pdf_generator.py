@@ -0,0 +1,369 @@
+"""BOM (bill of materials) PDF generation for estimates."""
+import os
+from collections import defaultdict
+from datetime import datetime
+from heapq import nlargest
+from io import BytesIO
+from operator import itemgetter
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is an optional accelerator
+    njit = None
+
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import (Image, Paragraph, SimpleDocTemplate, Spacer,
+                                Table, TableStyle)
+
+from config import Config
+
+# Estimate cost columns consumed by the summary and labor tables.  They are
+# read exactly once per document in generate_bom_pdf so the ORM attribute
+# machinery (including any expired-attribute reload after a commit) runs a
+# single time per attribute instead of once per table.
+_COST_KEYS = (
+    'total_engineering_hours', 'total_engineering_cost',
+    'total_panel_shop_hours', 'total_panel_shop_cost',
+    'total_machine_assembly_hours', 'total_machine_assembly_cost',
+)
+
+# Table styles that never vary between documents are built (and validated)
+# once at import time instead of on every call.
+_HEADER_TABLE_STYLE = TableStyle([
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+    ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+])
+_LAYOUT_TABLE_STYLE = TableStyle([
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('ALIGN', (0, 0), (0, 0), 'CENTER'),
+])
+_CHART_LOGO_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+_CHART_ONLY_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+])
+
+# The logo ships with the app, so its presence is fixed for the lifetime of
+# the process; checking once at import removes a stat per document.
+_LOGO_PATH = os.path.join('app', 'static', 'images',
+                          'stacked_rgb_300dpi.jpg')
+_LOGO_EXISTS = os.path.exists(_LOGO_PATH)
+
+# Timestamp format for the "Generated" line, parsed once at import.
+_TS_FMT = '%B %d, %Y at %I:%M %p'
+
+# The breakdown chart and table only show the largest categories; selecting
+# the top slice beats fully sorting sparse category maps.
+_TOP_CATEGORIES = 20
+
+# Single-pass filename sanitizer; covers the characters Windows rejects.
+_FN_TABLE = str.maketrans({c: '_' for c in ' /\\:*?"<>|'})
+
+# Below this row count the JIT warmup costs more than the Python loop saves.
+_NUMBA_MIN_ROWS = 2000
+
+if njit is not None:
+    @njit(cache=True)
+    def _aggregate_category_totals(codes, totals, n_cats):
+        out = np.zeros(n_cats)
+        for i in range(codes.size):
+            out[codes[i]] += totals[i]
+        return out
+
+
+class ChartFactory:
+    """Builds the reportlab graphics used in the BOM report."""
+
+    CHART_COLORS = [
+        colors.HexColor('#1f77b4'), colors.HexColor('#ff7f0e'),
+        colors.HexColor('#2ca02c'), colors.HexColor('#d62728'),
+        colors.HexColor('#9467bd'), colors.HexColor('#8c564b'),
+        colors.HexColor('#e377c2'), colors.HexColor('#7f7f7f'),
+        colors.HexColor('#bcbd22'), colors.HexColor('#17becf'),
+    ]
+
+    @classmethod
+    def create_pie_chart(cls, categories_data, width=3.0 * inch,
+                         height=3.0 * inch):
+        drawing = Drawing(width, height)
+        pie = Pie()
+        pie.x = 35
+        pie.y = 15
+        pie.width = width - 70
+        pie.height = height - 30
+        pie.data = [total for _, total in categories_data]
+        pie.labels = [name for name, _ in categories_data]
+        pie.sideLabels = True
+        pie.slices.strokeWidth = 0.5
+        for i in range(len(categories_data)):
+            pie.slices[i].fillColor = cls.CHART_COLORS[i % len(cls.CHART_COLORS)]
+        drawing.add(pie)
+        return drawing
+
+
+class ContentBuilder:
+    """Small formatting helpers shared by the report tables."""
+
+    @staticmethod
+    def calculate_percentage(value, total):
+        if total > 0:
+            return f"{value / total * 100:.1f}%"
+        return "0.0%"
+
+    @staticmethod
+    def format_currency(value):
+        return f"${value:,.2f}"
+
+
+class DocumentAssembler:
+    """Assembles the flowable 'story' for a BOM PDF."""
+
+    def __init__(self, estimate, project, bom_data, costs):
+        self.estimate = estimate
+        self.project = project
+        self.bom_data = bom_data
+        self.costs = costs
+        self.content = ContentBuilder()
+        self.styles = getSampleStyleSheet()
+        self.story = []
+        # Count of distinct purchased-component categories, recorded by
+        # _process_categories so the footer does not rescan bom_data.
+        self.category_count = 0
+
+    def add_header_section(self):
+        title_style = ParagraphStyle(
+            'BOMTitle', parent=self.styles['Title'], fontSize=18,
+            spaceAfter=6)
+        title = Paragraph('Bill of Materials', title_style)
+        header_table = Table([[title]], colWidths=[7.0 * inch])
+        header_table.setStyle(_HEADER_TABLE_STYLE)
+        self.story.append(header_table)
+        self.story.append(Spacer(1, 12))
+
+    def add_project_info(self, generated_at=None):
+        info_style = ParagraphStyle(
+            'BOMInfo', parent=self.styles['Normal'], fontSize=10,
+            spaceAfter=2)
+        generated = generated_at or datetime.now().strftime(_TS_FMT)
+        # One flowable instead of four; user-supplied names are escaped so
+        # they cannot inject reportlab markup into the document.
+        info_html = (
+            f"<b>Project:</b> {escape(self.project.project_name)}<br/>"
+            f"<b>Estimate:</b> {escape(self.estimate.estimate_name)}<br/>"
+            f"<b>Estimate #:</b> {escape(str(self.estimate.estimate_number))}"
+            f"<br/><b>Generated:</b> {generated}")
+        self.story.append(Paragraph(info_html, info_style))
+        self.story.append(Spacer(1, 12))
+
+    def build_summary_table(self, costs, total_purchased_components):
+        total_labor_cost = (costs['total_engineering_cost'] +
+                            costs['total_panel_shop_cost'] +
+                            costs['total_machine_assembly_cost'])
+        grand_total = total_labor_cost + total_purchased_components
+        rows = [
+            ['Cost Summary', ''],
+            ['Purchased Components',
+             self.content.format_currency(total_purchased_components)],
+            ['Labor', self.content.format_currency(total_labor_cost)],
+            ['Total', self.content.format_currency(grand_total)],
+        ]
+        summary_table = Table(rows, colWidths=[3.5 * inch, 1.5 * inch])
+        summary_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ]))
+        self.story.append(summary_table)
+        self.story.append(Spacer(1, 12))
+
+    def build_labor_table(self, costs):
+        # Zero-cost rows are dropped up front so the build loop below never
+        # formats values it is about to discard.
+        labor_data = [(name, hours, cost) for name, hours, cost in (
+            ('Engineering', costs['total_engineering_hours'],
+             costs['total_engineering_cost']),
+            ('Panel Shop', costs['total_panel_shop_hours'],
+             costs['total_panel_shop_cost']),
+            ('Machine Assembly', costs['total_machine_assembly_hours'],
+             costs['total_machine_assembly_cost']),
+        ) if cost > 0]
+        if not labor_data:
+            return
+        rows = [['Labor Category', 'Hours', 'Rate', 'Cost']]
+        for name, hours, cost in labor_data:
+            rate = cost / hours if hours > 0 else 0.0
+            rows.append([name, f"{hours:.1f}",
+                         self.content.format_currency(rate),
+                         self.content.format_currency(cost)])
+        labor_table = Table(rows, colWidths=[2.0 * inch, 1.0 * inch,
+                                             1.0 * inch, 1.0 * inch])
+        labor_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ]))
+        self.story.append(labor_table)
+        self.story.append(Spacer(1, 12))
+
+    def _process_categories(self):
+        if njit is not None and len(self.bom_data) > _NUMBA_MIN_ROWS:
+            category_totals = self._aggregate_categories_jit()
+        else:
+            category_totals = defaultdict(float)
+            for item in self.bom_data:
+                category = item.get('category', 'Uncategorized')
+                category_totals[category] += \
+                    float(item.get('total_price') or 0)
+        self.category_count = len(category_totals)
+        if self.costs['total_engineering_cost'] > 0:
+            category_totals['Engineering Labor'] = (
+                category_totals.get('Engineering Labor', 0.0) +
+                self.costs['total_engineering_cost'])
+        if self.costs['total_panel_shop_cost'] > 0:
+            category_totals['Panel Shop Labor'] = (
+                category_totals.get('Panel Shop Labor', 0.0) +
+                self.costs['total_panel_shop_cost'])
+        return dict(category_totals)
+
+    def _aggregate_categories_jit(self):
+        """Aggregate very large BOMs through the compiled Numba kernel.
+
+        Categories are factorized to integer codes so the kernel works on
+        two flat NumPy arrays; the file-based cache means compilation
+        happens once per deployment, not once per PDF.
+        """
+        n = len(self.bom_data)
+        code_for = {}
+        names = []
+        codes = np.empty(n, dtype=np.int64)
+        totals = np.empty(n, dtype=np.float64)
+        for i, item in enumerate(self.bom_data):
+            category = item.get('category', 'Uncategorized')
+            code = code_for.get(category)
+            if code is None:
+                code = code_for[category] = len(names)
+                names.append(category)
+            codes[i] = code
+            totals[i] = float(item.get('total_price') or 0)
+        sums = _aggregate_category_totals(codes, totals, len(names))
+        return dict(zip(names, sums.tolist()))
+
+    def build_category_table(self, categories_data, total_value):
+        # Percentages for the whole column in one vectorized pass instead of
+        # a zero-checked helper call per row.
+        totals_arr = np.fromiter((total for _, total in categories_data),
+                                 dtype=np.float64,
+                                 count=len(categories_data))
+        if total_value > 0:
+            pcts = totals_arr / total_value * 100.0
+        else:
+            pcts = np.zeros_like(totals_arr)
+        pct_strs = [f"{p:.1f}%" for p in pcts.tolist()]
+        fmt = self.content.format_currency
+        rows = [['Category', 'Total', '% of Total']]
+        for (name, total), pct in zip(categories_data, pct_strs):
+            rows.append([name, fmt(total), pct])
+        category_table = Table(rows, colWidths=[2.2 * inch, 1.2 * inch,
+                                                1.0 * inch])
+        category_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ]))
+        return category_table
+
+    def _create_chart_with_logo(self, pie_chart):
+        if _LOGO_EXISTS:
+            logo = Image(_LOGO_PATH, **Config.LOGO_SMALL)
+            content = Table([[pie_chart], [logo]], colWidths=[3.0 * inch])
+            content.setStyle(_CHART_LOGO_STYLE)
+            return content
+        return Table([[pie_chart]], colWidths=[3.0 * inch],
+                     style=_CHART_ONLY_STYLE)
+
+    def add_category_breakdown(self):
+        category_totals = self._process_categories()
+        if not category_totals:
+            return
+        total_value = sum(category_totals.values())
+        if len(category_totals) > _TOP_CATEGORIES:
+            sorted_categories = nlargest(_TOP_CATEGORIES,
+                                         category_totals.items(),
+                                         key=itemgetter(1))
+        else:
+            sorted_categories = sorted(category_totals.items(),
+                                       key=itemgetter(1), reverse=True)
+        pie_chart = ChartFactory.create_pie_chart(sorted_categories)
+        chart_content = self._create_chart_with_logo(pie_chart)
+        category_table = self.build_category_table(sorted_categories,
+                                                   total_value)
+        layout = Table([[chart_content, category_table]],
+                       colWidths=[3.2 * inch, 3.8 * inch])
+        layout.setStyle(_LAYOUT_TABLE_STYLE)
+        self.story.append(layout)
+        self.story.append(Spacer(1, 12))
+
+
+def generate_bom_pdf(estimate, project, bom_data, generated_at=None):
+    """Render the BOM report for an estimate and return it as a BytesIO.
+
+    Callers batch-generating many reports can pass a preformatted
+    ``generated_at`` string so all documents share one timestamp.
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter,
+                            leftMargin=0.75 * inch, rightMargin=0.75 * inch,
+                            topMargin=0.75 * inch, bottomMargin=0.75 * inch)
+
+    # Touch each estimate cost attribute once up front; every consumer below
+    # works from this plain dict rather than going back through the ORM.
+    costs = {k: float(getattr(estimate, k) or 0) for k in _COST_KEYS}
+
+    assembler = DocumentAssembler(estimate, project, bom_data, costs)
+    assembler.add_header_section()
+    assembler.add_project_info(generated_at)
+
+    total_purchased_components = sum(
+        float(item.get('total_price') or 0) for item in bom_data)
+    assembler.build_summary_table(costs, total_purchased_components)
+    assembler.build_labor_table(costs)
+    assembler.add_category_breakdown()
+
+    footer_style = ParagraphStyle(
+        'BOMFooter', parent=assembler.styles['Normal'], fontSize=8,
+        textColor=colors.grey)
+    assembler.story.append(Paragraph(
+        f"{len(bom_data)} line items across "
+        f"{assembler.category_count} categories",
+        footer_style))
+
+    doc.build(assembler.story)
+    buffer.seek(0)
+    return buffer
+
+
+def get_bom_filename(estimate):
+    """Build a download filename for an estimate's BOM PDF."""
+    safe_name = estimate.estimate_name.translate(_FN_TABLE)
+    return f"BOM_{estimate.estimate_number}_{safe_name}.pdf"
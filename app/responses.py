@@ -0,0 +1,15 @@
+"""Shared JSON response envelopes, encoded once with orjson."""
+import orjson
+from flask import Response
+
+
+def err(msg, code=400):
+    """A ``{'success': False, 'error': msg}`` response."""
+    return Response(orjson.dumps({'success': False, 'error': msg}),
+                    status=code, mimetype='application/json')
+
+
+def ok(**fields):
+    """A ``{'success': True, ...fields}`` response."""
+    return Response(orjson.dumps({'success': True, **fields}),
+                    mimetype='application/json')
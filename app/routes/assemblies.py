@@ -0,0 +1,556 @@
+import re
+
+import msgspec
+import orjson
+from flask import (Blueprint, Response, abort, flash, redirect,
+                   render_template, request, url_for)
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.orm import raiseload, selectinload
+from werkzeug.exceptions import HTTPException
+
+from app import cache, db
+from app.models import (Assembly, AssemblyCategory, AssemblyPart, Component,
+                        Estimate, StandardAssembly,
+                        StandardAssemblyComponent)
+from app.responses import err, ok
+from app.schemas import QUANTITY_DECODER, VERSION_DECODER
+
+bp = Blueprint('assemblies', __name__)
+
+# Strips the " (xN)" quantity suffix appended by update_assembly_quantity.
+_QTY_SUFFIX = re.compile(r' \(x[0-9.]+\)$')
+
+# classid for the two-int advisory-lock form: namespaces this app's
+# estimate locks away from any other advisory-lock user on the server.
+_ASSEMBLY_LOCK_CLASS = 4270
+
+# Server-side component copies: the rows never round-trip through Python.
+_COPY_STD_COMPONENTS_SQL = text("""
+    INSERT INTO assembly_parts
+        (assembly_id, part_id, quantity, unit_of_measure, sort_order, notes)
+    SELECT :aid, part_id, quantity * :mul, unit_of_measure, sort_order, notes
+    FROM standard_assembly_components
+    WHERE standard_assembly_id = :sid
+""")
+_COPY_ASSEMBLY_PARTS_SQL = text("""
+    INSERT INTO assembly_parts
+        (assembly_id, part_id, quantity, unit_of_measure, sort_order, notes)
+    SELECT :aid, part_id, quantity, unit_of_measure, sort_order, notes
+    FROM assembly_parts
+    WHERE assembly_id = :src
+""")
+# Quantity rescale for assemblies backed by a standard: components that
+# exist in the standard reset to standard_qty * new_qty; extras scale
+# proportionally.
+_SCALE_STD_PARTS_SQL = text("""
+    UPDATE assembly_parts
+    SET quantity = sac.quantity * :nq
+    FROM standard_assembly_components AS sac
+    WHERE assembly_parts.assembly_id = :aid
+      AND sac.standard_assembly_id = :sid
+      AND sac.part_id = assembly_parts.part_id
+""")
+_SCALE_EXTRA_PARTS_SQL = text("""
+    UPDATE assembly_parts
+    SET quantity = quantity * :mul
+    WHERE assembly_id = :aid
+      AND part_id NOT IN (SELECT part_id
+                          FROM standard_assembly_components
+                          WHERE standard_assembly_id = :sid)
+""")
+
+
+def _bust_estimate_cache(estimate_id):
+    """Drop cached query results for an estimate after any write to it."""
+    cache.delete(f"mh:{estimate_id}")
+    cache.delete(f"ca:{estimate_id}")
+
+
+def _next_sort_order(estimate_id):
+    """Claim the next assembly slot for an estimate.
+
+    A single row-locked UPDATE ... RETURNING on the estimate's counter:
+    no MAX aggregate scan, and the row lock serializes concurrent
+    creates for the rest of the transaction.
+    """
+    return db.session.execute(
+        update(Estimate)
+        .where(Estimate.estimate_id == estimate_id)
+        .values(next_assembly_sort_order=
+                Estimate.next_assembly_sort_order + 1)
+        .returning(Estimate.next_assembly_sort_order)
+    ).scalar_one()
+
+
+def _lock_estimate(estimate_id):
+    """Serialize writers that touch one estimate's assemblies.
+
+    On PostgreSQL this takes a transaction-scoped advisory lock keyed on
+    the estimate; it is released automatically at COMMIT/ROLLBACK and
+    costs no row locks. The (classid, estimate_id) key is deterministic,
+    so every app instance computes the same lock — Python's hash() is
+    salted per interpreter and must not be used here. SQLite serializes
+    writers at the database level, so nothing is needed there.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('SELECT pg_advisory_xact_lock(:c, :k)'),
+                           {'c': _ASSEMBLY_LOCK_CLASS, 'k': estimate_id})
+
+
+@bp.route('/create/<int:estimate_id>', methods=['GET', 'POST'])
+def create_assembly(estimate_id):
+    estimate = Estimate.query.get_or_404(estimate_id)
+    if request.method == 'POST':
+        assembly_name = request.form.get('assembly_name', '').strip()
+        if not assembly_name:
+            flash('Assembly name is required.', 'error')
+            return redirect(url_for('assemblies.create_assembly',
+                                    estimate_id=estimate_id))
+        standard_assembly_id = request.form.get('standard_assembly_id',
+                                                type=int)
+        quantity = request.form.get('quantity', 1.0, type=float)
+        try:
+            next_sort = _next_sort_order(estimate_id)
+            assembly = Assembly(
+                estimate_id=estimate_id,
+                assembly_name=assembly_name,
+                base_name=assembly_name,
+                standard_assembly_id=standard_assembly_id,
+                quantity=quantity,
+                sort_order=next_sort,
+            )
+            db.session.add(assembly)
+            db.session.flush()
+            if standard_assembly_id:
+                std_components = StandardAssemblyComponent.query.filter_by(
+                    standard_assembly_id=standard_assembly_id).order_by(
+                        StandardAssemblyComponent.sort_order).all()
+                for std_component in std_components:
+                    db.session.add(AssemblyPart(
+                        assembly_id=assembly.assembly_id,
+                        part_id=std_component.part_id,
+                        quantity=float(std_component.quantity) * quantity,
+                        unit_of_measure=std_component.unit_of_measure,
+                        sort_order=std_component.sort_order,
+                        notes=std_component.notes,
+                    ))
+            db.session.commit()
+            _bust_estimate_cache(estimate_id)
+            flash(f'Assembly "{assembly_name}" created.', 'success')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error creating assembly: {e}', 'error')
+        return redirect(url_for('assemblies.manage_hours',
+                                estimate_id=estimate_id))
+
+    # Cache the query results, not the rendered page: the render runs
+    # per request so get_flashed_messages stays session-scoped instead
+    # of one user's banner being served to everyone for the TTL.
+    seed = cache.get(f"ca:{estimate_id}")
+    if seed is None:
+        seed = {
+            'categories': [
+                {'category_id': c.category_id, 'code': c.code,
+                 'name': c.name}
+                for c in AssemblyCategory.query.filter_by(is_active=True)
+                .order_by(AssemblyCategory.name)],
+            'standard_assemblies': [
+                {'standard_assembly_id': s.standard_assembly_id,
+                 'assembly_name': s.assembly_name, 'version': s.version}
+                for s in StandardAssembly.query.filter_by(is_active=True)
+                .order_by(StandardAssembly.assembly_name)],
+        }
+        cache.set(f"ca:{estimate_id}", seed, timeout=60)
+    return render_template('assemblies/create_assembly.html',
+                           estimate=estimate, **seed)
+
+
+@bp.route('/delete/<int:assembly_id>', methods=['POST'])
+def delete_assembly(assembly_id):
+    try:
+        # Children are cleared with bulk DELETEs instead of ORM cascades;
+        # the assembly row itself is removed in the same round-trip that
+        # reads back the fields needed for the flash/redirect.
+        db.session.execute(delete(AssemblyPart).where(
+            AssemblyPart.assembly_id == assembly_id))
+        db.session.execute(delete(Component).where(
+            Component.assembly_id == assembly_id))
+        row = db.session.execute(
+            delete(Assembly)
+            .where(Assembly.assembly_id == assembly_id)
+            .returning(Assembly.estimate_id, Assembly.assembly_name)
+        ).first()
+        if row is None:
+            db.session.rollback()
+            abort(404)
+        db.session.commit()
+        _bust_estimate_cache(row.estimate_id)
+        flash(f'Assembly "{row.assembly_name}" deleted.', 'success')
+        return redirect(url_for('assemblies.manage_hours',
+                                estimate_id=row.estimate_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error deleting assembly: {e}', 'error')
+        return redirect(request.referrer or url_for('assemblies.manage_hours',
+                                                    estimate_id=0))
+
+
+@bp.route('/<int:assembly_id>/update-quantity', methods=['POST'])
+def update_assembly_quantity(assembly_id):
+    # Cheapest checks first: malformed or out-of-range payloads are
+    # rejected without touching the database.
+    try:
+        payload = QUANTITY_DECODER.decode(request.get_data())
+    except msgspec.DecodeError as e:
+        return err(f'Invalid JSON payload: {e}')
+    new_quantity = float(payload.quantity)
+    if new_quantity < 1:
+        return err('Quantity must be at least 1')
+    assembly = db.session.get(Assembly, assembly_id,
+                              options=(raiseload('*'),))
+    if assembly is None:
+        abort(404)
+    try:
+        _lock_estimate(assembly.estimate_id)
+        # If we waited on the lock, the row loaded above is a stale
+        # snapshot; re-read it so the no-op check and the rescale
+        # multiplier see what the previous holder committed.
+        db.session.refresh(assembly)
+        # Debounced/double-submitted no-op updates skip the component
+        # rewrite, the name rewrite, and the commit fsync entirely.
+        if new_quantity == float(assembly.quantity or 1):
+            return ok(new_quantity=new_quantity,
+                      assembly_name=assembly.assembly_name, unchanged=True)
+        # Rows that predate base_name fall back to stripping the suffix
+        # from the display name once, then persist the result.
+        base_name = (assembly.base_name or
+                     _QTY_SUFFIX.sub('', assembly.assembly_name))
+        assembly.base_name = base_name
+
+        if assembly.standard_assembly_id:
+            old_multiplier = float(assembly.quantity or 1)
+            db.session.execute(_SCALE_STD_PARTS_SQL, {
+                'nq': new_quantity,
+                'aid': assembly.assembly_id,
+                'sid': assembly.standard_assembly_id,
+            })
+            db.session.execute(_SCALE_EXTRA_PARTS_SQL, {
+                'mul': new_quantity / old_multiplier,
+                'aid': assembly.assembly_id,
+                'sid': assembly.standard_assembly_id,
+            })
+
+        assembly.quantity = new_quantity
+        if new_quantity > 1:
+            qty_label = (int(new_quantity) if new_quantity.is_integer()
+                         else new_quantity)
+            assembly.assembly_name = f"{base_name} (x{qty_label})"
+        else:
+            assembly.assembly_name = base_name
+        db.session.commit()
+        _bust_estimate_cache(assembly.estimate_id)
+        return ok(new_quantity=new_quantity,
+                  assembly_name=assembly.assembly_name)
+    except Exception as e:
+        db.session.rollback()
+        return err(str(e), 500)
+
+
+@bp.route('/<int:assembly_id>/refresh-to-active', methods=['POST'])
+def refresh_assembly_to_active(assembly_id):
+    assembly = Assembly.query.options(raiseload('*')).filter_by(
+        assembly_id=assembly_id).first_or_404()
+    if not assembly.standard_assembly_id:
+        return err('Assembly is not linked to a standard assembly')
+    try:
+        # Same lock as update_assembly_quantity: the delete+copy below
+        # must not interleave with a concurrent rescale or version swap
+        # on this estimate's assembly_parts. Lock before reading
+        # anything the copy math depends on, then re-read the row so
+        # the multiplier and version link reflect the latest commit.
+        _lock_estimate(assembly.estimate_id)
+        db.session.refresh(assembly)
+
+        current_standard = StandardAssembly.query.get(
+            assembly.standard_assembly_id)
+        base_id = (current_standard.base_assembly_id or
+                   current_standard.standard_assembly_id)
+        # One OR query instead of the sequential miss-then-hit probes.
+        active_standard = StandardAssembly.query.filter(
+            db.or_(StandardAssembly.standard_assembly_id == base_id,
+                   StandardAssembly.base_assembly_id == base_id),
+            StandardAssembly.is_active.is_(True)).first()
+        if not active_standard:
+            return err('No active version found', 404)
+        if (active_standard.standard_assembly_id ==
+                assembly.standard_assembly_id):
+            return ok(message='Assembly already matches the active version')
+
+        quantity_multiplier = float(assembly.quantity or 1)
+
+        # One statement for the whole collection instead of loading every
+        # AssemblyPart and deleting it through the session row by row.
+        AssemblyPart.query.filter_by(
+            assembly_id=assembly.assembly_id).delete(
+                synchronize_session=False)
+
+        # Copy the active components entirely server-side; no row crosses
+        # the Python boundary.
+        result = db.session.execute(_COPY_STD_COMPONENTS_SQL, {
+            'aid': assembly.assembly_id,
+            'mul': quantity_multiplier,
+            'sid': active_standard.standard_assembly_id,
+        })
+        assembly.standard_assembly_id = active_standard.standard_assembly_id
+        db.session.commit()
+        _bust_estimate_cache(assembly.estimate_id)
+        return ok(new_version=active_standard.version,
+                  component_count=result.rowcount)
+    except Exception as e:
+        db.session.rollback()
+        return err(str(e), 500)
+
+
+@bp.route('/<int:assembly_id>/change-version', methods=['POST'])
+def change_assembly_version(assembly_id):
+    try:
+        payload = VERSION_DECODER.decode(request.get_data())
+    except msgspec.DecodeError as e:
+        return err(f'Invalid JSON payload: {e}')
+    new_version = payload.version
+    if not new_version:
+        return err('Version is required')
+    assembly = db.session.get(Assembly, assembly_id,
+                              options=(raiseload('*'),))
+    if assembly is None:
+        abort(404)
+    if not assembly.standard_assembly_id:
+        return err('Assembly is not linked to a standard assembly')
+    try:
+        # Serialize against concurrent rescales/refreshes, then re-read
+        # the row under the lock so the copy multiplier isn't taken
+        # from a pre-lock snapshot.
+        _lock_estimate(assembly.estimate_id)
+        db.session.refresh(assembly)
+
+        current_standard = StandardAssembly.query.get(
+            assembly.standard_assembly_id)
+        base_id = (current_standard.base_assembly_id or
+                   current_standard.standard_assembly_id)
+        # Fetch every version of this standard once; the target lookup and
+        # the error message's available list both come from the same rows.
+        by_version = {s.version: s for s in StandardAssembly.query.filter(
+            db.or_(StandardAssembly.standard_assembly_id == base_id,
+                   StandardAssembly.base_assembly_id == base_id)).all()}
+        target_standard = by_version.get(new_version)
+        if not target_standard:
+            versions = ', '.join(sorted(by_version))
+            return err(f'Version {new_version} not found. '
+                       f'Available versions: {versions}', 404)
+
+        quantity_multiplier = float(assembly.quantity or 1)
+
+        # Same bulk DELETE as refresh_assembly_to_active: a single statement
+        # replaces the per-row session.delete loop.
+        AssemblyPart.query.filter_by(
+            assembly_id=assembly.assembly_id).delete(
+                synchronize_session=False)
+        # synchronize_session=False leaves any loaded collection stale;
+        # expire it so a later access in this session reloads from the DB.
+        db.session.expire(assembly, ['assembly_parts'])
+
+        result = db.session.execute(_COPY_STD_COMPONENTS_SQL, {
+            'aid': assembly.assembly_id,
+            'mul': quantity_multiplier,
+            'sid': target_standard.standard_assembly_id,
+        })
+        assembly.standard_assembly_id = target_standard.standard_assembly_id
+        db.session.commit()
+        _bust_estimate_cache(assembly.estimate_id)
+        return ok(new_version=target_standard.version,
+                  component_count=result.rowcount)
+    except Exception as e:
+        db.session.rollback()
+        return err(str(e), 500)
+
+
+@bp.route('/<int:assembly_id>/copy', methods=['POST'])
+def copy_assembly(assembly_id):
+    copy_components = True
+    if request.is_json:
+        copy_components = bool(request.json.get('copy_components', True))
+    # The parts collection is only read when the caller asked for it, so
+    # the source fetch never eager-loads it.
+    source_assembly = Assembly.query.options(raiseload('*')).filter_by(
+        assembly_id=assembly_id).first_or_404()
+    try:
+        next_sort = _next_sort_order(source_assembly.estimate_id)
+        new_assembly = Assembly(
+            estimate_id=source_assembly.estimate_id,
+            standard_assembly_id=source_assembly.standard_assembly_id,
+            assembly_name=f"{source_assembly.assembly_name} (copy)",
+            base_name=(f"{source_assembly.base_name} (copy)"
+                       if source_assembly.base_name else None),
+            quantity=source_assembly.quantity,
+            engineering_hours=source_assembly.engineering_hours,
+            panel_shop_hours=source_assembly.panel_shop_hours,
+            machine_assembly_hours=source_assembly.machine_assembly_hours,
+            sort_order=next_sort,
+        )
+        db.session.add(new_assembly)
+        db.session.flush()
+        if copy_components:
+            db.session.execute(_COPY_ASSEMBLY_PARTS_SQL, {
+                'aid': new_assembly.assembly_id,
+                'src': source_assembly.assembly_id,
+            })
+        db.session.commit()
+        _bust_estimate_cache(source_assembly.estimate_id)
+        return ok(new_assembly_id=new_assembly.assembly_id,
+                  assembly_name=new_assembly.assembly_name)
+    except Exception as e:
+        db.session.rollback()
+        return err(str(e), 500)
+
+
+@bp.route('/estimate/<int:estimate_id>/hours')
+def manage_hours(estimate_id):
+    # Same split as create_assembly: the assembly rows are cached as
+    # plain dicts and the template renders fresh each request, so flash
+    # messages never end up shared between sessions via the cache.
+    estimate = db.session.get(Estimate, estimate_id,
+                              options=(raiseload('*'),))
+    if estimate is None:
+        abort(404)
+    assemblies = cache.get(f"mh:{estimate_id}")
+    if assemblies is None:
+        assemblies = [{
+            'assembly_id': a.assembly_id,
+            'assembly_name': a.assembly_name,
+            'engineering_hours': a.engineering_hours,
+            'panel_shop_hours': a.panel_shop_hours,
+            'machine_assembly_hours': a.machine_assembly_hours,
+            'estimated_by': a.estimated_by,
+            'time_estimate_notes': a.time_estimate_notes,
+        } for a in Assembly.query.filter_by(estimate_id=estimate_id)
+            .order_by(Assembly.sort_order)]
+        cache.set(f"mh:{estimate_id}", assemblies, timeout=60)
+    return render_template('assemblies/manage_hours.html',
+                           estimate=estimate, assemblies=assemblies)
+
+
+@bp.route('/estimate/<int:estimate_id>/hours', methods=['POST'])
+def update_hours(estimate_id):
+    estimate = Estimate.query.options(
+        selectinload(Estimate.assemblies), raiseload('*')).filter_by(
+            estimate_id=estimate_id).first_or_404()
+    try:
+        # Diff form values against the loaded rows and update only the
+        # assemblies (and columns) that actually changed; a submit that
+        # touches 1 of 30 rows issues 1 UPDATE, not 30.
+        updates = []
+        for assembly in estimate.assemblies:
+            aid = assembly.assembly_id
+            changed = {}
+            for field in ('engineering_hours', 'panel_shop_hours',
+                          'machine_assembly_hours'):
+                new_value = float(request.form.get(f'{field}_{aid}') or 0)
+                if new_value != float(getattr(assembly, field) or 0):
+                    changed[field] = new_value
+            for field in ('estimated_by', 'time_estimate_notes'):
+                new_value = request.form.get(f'{field}_{aid}', '')
+                if new_value != (getattr(assembly, field) or ''):
+                    changed[field] = new_value
+            if changed:
+                changed['assembly_id'] = aid
+                updates.append(changed)
+        if updates:
+            db.session.bulk_update_mappings(Assembly, updates)
+        db.session.commit()
+        _bust_estimate_cache(estimate_id)
+        flash('Hours updated.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error updating hours: {e}', 'error')
+    return redirect(url_for('assemblies.manage_hours',
+                            estimate_id=estimate_id))
+
+
+@bp.route('/api/categories/active')
+@cache.cached(timeout=300, key_prefix='active_cats')
+def api_active_categories():
+    categories = AssemblyCategory.query.filter_by(is_active=True).order_by(
+        AssemblyCategory.name).all()
+    # Emit orjson's bytes directly: skips jsonify's str round-trip and
+    # the WSGI str->bytes encode on the (cached) response body.
+    return Response(orjson.dumps(
+        [{'category_id': c.category_id, 'code': c.code, 'name': c.name}
+         for c in categories]), mimetype='application/json')
+
+
+@bp.route('/api/categories', methods=['POST'])
+def create_category():
+    code = request.form.get('code', '').strip()
+    name = request.form.get('name', '').strip()
+    if not code or not name:
+        return err('Code and name are required')
+    try:
+        category = AssemblyCategory(code=code, name=name)
+        db.session.add(category)
+        db.session.commit()
+        cache.delete('active_cats')
+        return ok(category_id=category.category_id)
+    except Exception as e:
+        db.session.rollback()
+        return err(str(e), 500)
+
+
+@bp.route('/api/categories/<int:category_id>/edit', methods=['POST'])
+def edit_category(category_id):
+    category = AssemblyCategory.query.get_or_404(category_id)
+    try:
+        category.code = request.form.get('code', category.code).strip()
+        category.name = request.form.get('name', category.name).strip()
+        db.session.commit()
+        cache.delete('active_cats')
+        return ok()
+    except Exception as e:
+        db.session.rollback()
+        return err(str(e), 500)
+
+
+@bp.route('/api/categories/<int:category_id>/delete', methods=['POST'])
+def delete_category(category_id):
+    category = AssemblyCategory.query.get_or_404(category_id)
+    # EXISTS stops at the first match; the full count is only paid on
+    # the conflict path, where the error message needs it.
+    in_use = db.session.query(
+        StandardAssembly.query.filter_by(
+            category=category.code).exists()).scalar()
+    if in_use:
+        count = StandardAssembly.query.filter_by(
+            category=category.code).count()
+        return err(f'Category is used by {count} standard assemblies')
+    try:
+        db.session.delete(category)
+        db.session.commit()
+        cache.delete('active_cats')
+        return ok()
+    except Exception as e:
+        db.session.rollback()
+        return err(str(e), 500)
+
+
+@bp.route('/api/categories/<int:category_id>/toggle', methods=['POST'])
+def toggle_category(category_id):
+    category = AssemblyCategory.query.get_or_404(category_id)
+    try:
+        category.is_active = not category.is_active
+        db.session.commit()
+        cache.delete('active_cats')
+        return ok(is_active=category.is_active)
+    except Exception as e:
+        db.session.rollback()
+        return err(str(e), 500)
@@ -0,0 +1,402 @@
+import math
+from operator import itemgetter
+
+import orjson
+from flask import (Blueprint, Response, abort, flash, jsonify, redirect,
+                   render_template, request, url_for)
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import joinedload, raiseload
+
+from app import cache, db
+from app.models import (Assembly, AssemblyPart, Component, Parts,
+                        PartsPriceHistory, PriceHistory)
+
+bp = Blueprint('components', __name__)
+
+# Core column set for the component grid: plain Row tuples, no ORM
+# hydration, and the current price resolved as a correlated subquery
+# instead of the per-row query the Parts.current_price property runs.
+_CURRENT_PRICE_SQ = (
+    select(PartsPriceHistory.new_price)
+    .where(PartsPriceHistory.part_id == Parts.part_id,
+           PartsPriceHistory.is_current.is_(True))
+    .limit(1)
+    .scalar_subquery()
+)
+_LIST_STMT = (
+    select(AssemblyPart.assembly_part_id, AssemblyPart.part_id,
+           Parts.model.label('component_name'), Parts.description,
+           Parts.part_number, Parts.manufacturer, Parts.category,
+           AssemblyPart.quantity, AssemblyPart.unit_of_measure,
+           _CURRENT_PRICE_SQ.label('unit_price'),
+           AssemblyPart.sort_order, AssemblyPart.notes,
+           AssemblyPart.created_at, AssemblyPart.updated_at)
+    .join(Parts, AssemblyPart.part_id == Parts.part_id)
+)
+# Pass-through grid columns, pulled per row with one C-level itemgetter
+# instead of ten mapping lookups; the remaining fields need transforms
+# and are set individually.
+_ROW_KEYS = ('assembly_part_id', 'part_id', 'component_name', 'description',
+             'part_number', 'manufacturer', 'category', 'unit_of_measure',
+             'sort_order', 'notes')
+_ROW_GET = itemgetter(*_ROW_KEYS)
+
+
+def _insert_component(assembly_id, part, quantity, unit_of_measure, notes):
+    """INSERT a component row and serialize it, all in one round-trip.
+
+    The sort_order is computed inside the INSERT itself and RETURNING
+    hands back the generated id/timestamps, so there is no separate MAX
+    query before the insert and no re-SELECT after the commit.
+    """
+    next_sort = (
+        select(func.coalesce(func.max(AssemblyPart.sort_order), 0) + 1)
+        .where(AssemblyPart.assembly_id == assembly_id)
+        .scalar_subquery())
+    row = db.session.execute(
+        insert(AssemblyPart)
+        .values(assembly_id=assembly_id, part_id=part.part_id,
+                quantity=quantity, unit_of_measure=unit_of_measure,
+                notes=notes, sort_order=next_sort)
+        .returning(AssemblyPart.assembly_part_id, AssemblyPart.sort_order,
+                   AssemblyPart.created_at, AssemblyPart.updated_at)
+    ).one()
+    unit_price = part.current_price
+    return {
+        'assembly_part_id': row.assembly_part_id,
+        'part_id': part.part_id,
+        'component_name': part.model,
+        'description': part.description,
+        'part_number': part.part_number,
+        'manufacturer': part.manufacturer,
+        'category': part.category,
+        'quantity': float(quantity or 0),
+        'unit_of_measure': unit_of_measure,
+        'unit_price': unit_price,
+        'total_price': (float(quantity or 0) * unit_price
+                        if unit_price is not None else None),
+        'sort_order': row.sort_order,
+        'notes': notes,
+        'created_at': row.created_at,
+        'updated_at': row.updated_at,
+    }
+
+
+def _assembly_part_json(ap):
+    return {
+        'assembly_part_id': ap.assembly_part_id,
+        'part_id': ap.part_id,
+        'component_name': ap.component_name,
+        'description': ap.description,
+        'part_number': ap.part_number,
+        'manufacturer': ap.part.manufacturer if ap.part else None,
+        'category': ap.part.category if ap.part else None,
+        'quantity': float(ap.quantity or 0),
+        'unit_of_measure': ap.unit_of_measure,
+        'unit_price': ap.unit_price,
+        'total_price': ap.total_price,
+        'sort_order': ap.sort_order,
+        'notes': ap.notes,
+        'created_at': ap.created_at,
+        'updated_at': ap.updated_at,
+    }
+
+
+@bp.route('/api/list/<int:assembly_id>')
+def api_list_components(assembly_id):
+    if db.session.get(Assembly, assembly_id) is None:
+        abort(404)
+    # Versioned cache key: one index scan for the stamp, and any
+    # component write rolls the key automatically — no explicit
+    # invalidation in the write endpoints. The row count is part of the
+    # stamp because a delete removes a row without moving
+    # MAX(updated_at).
+    stamp, count = db.session.query(
+        db.func.max(AssemblyPart.updated_at),
+        db.func.count(AssemblyPart.assembly_part_id)).filter_by(
+            assembly_id=assembly_id).one()
+    cache_key = f"cl:{assembly_id}:{stamp}-{count}"
+    payload = cache.get(cache_key)
+    if payload is None:
+        # yield_per streams the cursor in bounded batches, so peak
+        # memory is the serialized payload rather than payload plus a
+        # fully buffered raw result set.
+        rows = db.session.execute(
+            _LIST_STMT.where(AssemblyPart.assembly_id == assembly_id)
+            .order_by(AssemblyPart.sort_order)
+            .execution_options(yield_per=500)).mappings()
+        payload = []
+        for r in rows:
+            item = dict(zip(_ROW_KEYS, _ROW_GET(r)))
+            quantity = float(r['quantity'] or 0)
+            unit_price = (float(r['unit_price'])
+                          if r['unit_price'] is not None else None)
+            item['quantity'] = quantity
+            item['unit_price'] = unit_price
+            item['total_price'] = (quantity * unit_price
+                                   if unit_price is not None else None)
+            # Raw datetimes: orjson emits ISO-8601 in C, no per-row
+            # strftime.
+            item['created_at'] = r['created_at']
+            item['updated_at'] = r['updated_at']
+            payload.append(item)
+        # Encode once and cache the bytes: cache hits skip
+        # serialization entirely, not just the queries.
+        payload = orjson.dumps(payload, option=orjson.OPT_NAIVE_UTC)
+        cache.set(cache_key, payload, timeout=30)
+    return Response(payload, mimetype='application/json')
+
+
+@bp.route('/api/add/<int:assembly_id>', methods=['POST'])
+def api_add_component(assembly_id):
+    if db.session.get(Assembly, assembly_id) is None:
+        abort(404)
+    data = request.json or {}
+    part = db.session.get(Parts, data.get('part_id') or 0)
+    if part is None:
+        return jsonify({'success': False, 'error': 'Part not found'}), 404
+    try:
+        component = _insert_component(
+            assembly_id, part,
+            quantity=float(data.get('quantity') or 1),
+            unit_of_measure=data.get('unit_of_measure'),
+            notes=data.get('notes'))
+        db.session.commit()
+        return jsonify({'success': True, 'component': component})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/<int:assembly_part_id>/update', methods=['POST'])
+def api_update_component(assembly_part_id):
+    assembly_part = db.session.get(
+        AssemblyPart, assembly_part_id,
+        options=(joinedload(AssemblyPart.part), raiseload('*')))
+    if assembly_part is None:
+        abort(404)
+    data = request.json or {}
+    try:
+        if 'quantity' in data:
+            assembly_part.quantity = float(data['quantity'])
+        if 'unit_of_measure' in data:
+            assembly_part.unit_of_measure = data['unit_of_measure']
+        if 'notes' in data:
+            assembly_part.notes = data['notes']
+        if data.get('unit_price') is not None:
+            # update_price applies the tolerant no-op compare itself.
+            assembly_part.part.update_price(
+                float(data['unit_price']),
+                reason='Updated from component grid')
+        db.session.commit()
+        return jsonify({'success': True,
+                        'component': _assembly_part_json(assembly_part)})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/<int:assembly_part_id>/delete', methods=['POST'])
+def api_delete_component(assembly_part_id):
+    assembly_part = db.session.get(AssemblyPart, assembly_part_id)
+    if assembly_part is None:
+        abort(404)
+    try:
+        db.session.delete(assembly_part)
+        db.session.commit()
+        return jsonify({'success': True})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/<int:assembly_part_id>/duplicate', methods=['POST'])
+def api_duplicate_component(assembly_part_id):
+    source = db.session.get(AssemblyPart, assembly_part_id)
+    if source is None:
+        abort(404)
+    try:
+        component = _insert_component(
+            source.assembly_id, source.part,
+            quantity=float(source.quantity or 1),
+            unit_of_measure=source.unit_of_measure,
+            notes=source.notes)
+        db.session.commit()
+        return jsonify({'success': True, 'component': component})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/bulk-delete', methods=['POST'])
+def api_bulk_delete_components():
+    component_ids = (request.json or {}).get('component_ids') or []
+    if not component_ids:
+        return jsonify({'success': False,
+                        'error': 'No components selected'}), 400
+    try:
+        # int-cast up front so the IN list binds integers, then one
+        # DELETE for the whole selection instead of loading each row
+        # into the session.
+        ids = [int(cid) for cid in component_ids]
+    except (TypeError, ValueError):
+        return jsonify({'success': False,
+                        'error': 'Invalid component ids'}), 400
+    try:
+        deleted_count = AssemblyPart.query.filter(
+            AssemblyPart.assembly_part_id.in_(ids)).delete(
+                synchronize_session=False)
+        db.session.commit()
+        return jsonify({'success': True, 'deleted_count': deleted_count})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/<int:component_id>/price-history')
+def price_history_data(component_id):
+    component = db.session.get(Component, component_id)
+    if component is None:
+        abort(404)
+    # Same versioned-key scheme as api_list_components: a price change
+    # moves MAX(changed_at) or component.updated_at and rolls the key.
+    max_changed = db.session.query(
+        db.func.max(PriceHistory.changed_at)).filter_by(
+            component_id=component_id).scalar()
+    cache_key = f"ph:{component_id}:{max_changed}:{component.updated_at}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return Response(cached, mimetype='application/json')
+    # Only the four columns the chart needs come back, as plain tuples.
+    # The chart wants every row anyway, so the statistics derive from
+    # the same fetch — no separate aggregate round-trip.
+    rows = db.session.execute(
+        select(PriceHistory.changed_at, PriceHistory.old_price,
+               PriceHistory.new_price, PriceHistory.changed_reason)
+        .where(PriceHistory.component_id == component_id)
+        .order_by(PriceHistory.changed_at)).all()
+    statistics = {}
+    trend = 'flat'
+    if rows:
+        prices = [float(r.new_price) for r in rows]
+        statistics = {
+            'min': min(prices),
+            'max': max(prices),
+            'avg': sum(prices) / len(prices),
+            'count': len(prices),
+        }
+        if prices[-1] > prices[0]:
+            trend = 'up'
+        elif prices[-1] < prices[0]:
+            trend = 'down'
+    detailed_history = [{
+        'changed_at': changed_at,
+        'old_price': float(old_price) if old_price is not None else None,
+        'new_price': float(new_price),
+        'changed_reason': changed_reason,
+    } for changed_at, old_price, new_price, changed_reason in rows]
+    payload = {
+        'component_name': component.component_name,
+        'current_price': float(component.unit_price or 0),
+        'statistics': statistics,
+        'trend': trend,
+        'history': detailed_history,
+    }
+    encoded = orjson.dumps(payload, option=orjson.OPT_NAIVE_UTC)
+    cache.set(cache_key, encoded, timeout=30)
+    return Response(encoded, mimetype='application/json')
+
+
+@bp.route('/<int:component_id>/edit', methods=['GET', 'POST'])
+def edit_component(component_id):
+    component = db.session.get(Component, component_id)
+    if component is None:
+        abort(404)
+    if request.method == 'POST':
+        try:
+            component.component_name = request.form.get(
+                'component_name', component.component_name)
+            component.description = request.form.get(
+                'description', component.description)
+            component.quantity = float(
+                request.form.get('quantity') or component.quantity or 1)
+            new_price = float(
+                request.form.get('unit_price') or component.unit_price or 0)
+            old_price = float(component.unit_price or 0)
+            if not math.isclose(old_price, new_price,
+                                rel_tol=1e-9, abs_tol=1e-4):
+                db.session.add(PriceHistory(
+                    component_id=component.component_id,
+                    old_price=old_price,
+                    new_price=new_price,
+                    changed_reason=request.form.get('change_reason'),
+                ))
+                component.unit_price = new_price
+            db.session.commit()
+            flash('Component updated.', 'success')
+            return redirect(url_for('assemblies.manage_hours',
+                                    estimate_id=component.assembly
+                                    .estimate_id))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error updating component: {e}', 'error')
+    return render_template('components/edit_component.html',
+                           component=component)
+
+
+@bp.route('/part/<int:assembly_part_id>/edit', methods=['GET', 'POST'])
+def edit_assembly_part(assembly_part_id):
+    # The POST path reads assembly.estimate_id for the redirect, so the
+    # assembly relation is eager too; everything else raises.
+    assembly_part = db.session.get(
+        AssemblyPart, assembly_part_id,
+        options=(joinedload(AssemblyPart.part),
+                 joinedload(AssemblyPart.assembly), raiseload('*')))
+    if assembly_part is None:
+        abort(404)
+    if request.method == 'POST':
+        try:
+            assembly_part.quantity = float(
+                request.form.get('quantity') or assembly_part.quantity or 1)
+            assembly_part.notes = request.form.get(
+                'notes', assembly_part.notes)
+            new_price = request.form.get('unit_price', type=float)
+            if new_price is not None:
+                assembly_part.part.update_price(
+                    new_price, reason=request.form.get('change_reason'))
+            db.session.commit()
+            flash('Component updated.', 'success')
+            return redirect(url_for(
+                'assemblies.manage_hours',
+                estimate_id=assembly_part.assembly.estimate_id))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error updating component: {e}', 'error')
+    # Bounded dropdown seed; anything beyond 50 rows comes from the
+    # typeahead search endpoint below.
+    similar_parts = Parts.query.filter_by(
+        category_id=assembly_part.part.category_id).limit(50).all()
+    if len(similar_parts) <= 1:
+        similar_parts = Parts.query.limit(50).all()
+    return render_template('components/edit_assembly_part.html',
+                           assembly_part=assembly_part,
+                           similar_parts=similar_parts)
+
+
+@bp.route('/api/parts/search')
+def api_search_parts():
+    """Typeahead part lookup: bounded, columns-only, no ORM rows."""
+    q = request.args.get('q', '').strip()
+    category_id = request.args.get('category_id', type=int)
+    stmt = select(Parts.part_id, Parts.part_number, Parts.description)
+    if category_id:
+        stmt = stmt.where(Parts.category_id == category_id)
+    if q:
+        stmt = stmt.where(Parts.description.ilike(f'{q}%'))
+    rows = db.session.execute(stmt.order_by(Parts.part_number)
+                              .limit(20)).all()
+    return Response(orjson.dumps([
+        {'part_id': part_id, 'part_number': part_number,
+         'description': description}
+        for part_id, part_number, description in rows]),
+        mimetype='application/json')
@@ -0,0 +1,484 @@
+import csv
+import io
+import tempfile
+import zipfile
+from datetime import datetime
+
+import orjson
+from flask import (Blueprint, Response, current_app, jsonify, request,
+                   send_file, stream_with_context)
+from sqlalchemy import (Float, cast, delete, func, insert, select, tuple_,
+                        update)
+
+from app import cache, db
+from app.models import (Assembly, AssemblyPart, Estimate, Parts,
+                        PartsPriceHistory, Project)
+
+bp = Blueprint('database', __name__)
+
+_ITEMS_PER_FILE = 500
+_MAX_PER_PAGE = 500
+
+# Current prices as a joinable derived table: the planner hashes the
+# is_current rows once and probes per part, instead of re-executing a
+# correlated subquery for every output row.
+_CURRENT_PRICE = (
+    select(PartsPriceHistory.part_id,
+           PartsPriceHistory.new_price.label('price'))
+    .where(PartsPriceHistory.is_current.is_(True))
+    .subquery()
+)
+
+# Columns-only catalog statement: Row tuples, no Parts instances, and
+# the current price resolved in SQL rather than through the per-row
+# query the current_price property runs.
+_CATALOG_STMT = (
+    select(Parts.part_id, Parts.category, Parts.model, Parts.rating,
+           Parts.master_item_number, Parts.manufacturer, Parts.part_number,
+           Parts.upc, Parts.description, Parts.vendor, Parts.effective_date,
+           Parts.created_at, Parts.updated_at,
+           # Cast in SQL so the row needs no per-column fixup in Python
+           # before encoding (orjson takes float, not Decimal).
+           cast(_CURRENT_PRICE.c.price, Float).label('current_price'))
+    .outerjoin(_CURRENT_PRICE,
+               Parts.part_id == _CURRENT_PRICE.c.part_id)
+    .order_by(Parts.updated_at.desc(), Parts.part_id.desc())
+)
+
+
+# Keys in _CATALOG_STMT column order; with the price cast done in SQL
+# the projection is a single C-level dict(zip(...)) per row instead of
+# a 14-entry tuple unpack plus dict literal in bytecode.
+_CATALOG_KEYS = ('part_id', 'category', 'model', 'rating',
+                 'master_item_number', 'manufacturer', 'part_number',
+                 'upc', 'description', 'vendor', 'effective_date',
+                 'created_at', 'updated_at', 'current_price')
+
+
+def _catalog_row(row, _keys=_CATALOG_KEYS):
+    return dict(zip(_keys, row))
+
+
+def _paged_catalog(etag, count):
+    """One page of the catalog: keyset via ?cursor, else limit/offset.
+
+    The keyset form stays O(page size) however deep the client reads;
+    ?cursor wins over ?page when both are sent.
+    """
+    per_page = min(request.args.get('per_page', 100, type=int),
+                   _MAX_PER_PAGE)
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            ts, _, last_id = cursor.partition(',')
+            boundary = (datetime.fromtimestamp(float(ts)), int(last_id))
+        except (OverflowError, OSError, ValueError):
+            return jsonify({'success': False,
+                            'error': 'Invalid cursor'}), 400
+        stmt = _CATALOG_STMT.where(
+            tuple_(Parts.updated_at, Parts.part_id) < boundary)
+        rows = db.session.execute(stmt.limit(per_page)).all()
+        next_cursor = None
+        if len(rows) == per_page:
+            last = rows[-1]
+            next_cursor = f'{last.updated_at.timestamp()},{last.part_id}'
+        payload = {'items': [_catalog_row(row) for row in rows],
+                   'next_cursor': next_cursor}
+        etag = f'{etag}-c{cursor}'
+    else:
+        page = max(request.args.get('page', 1, type=int), 1)
+        rows = db.session.execute(
+            _CATALOG_STMT.limit(per_page)
+            .offset((page - 1) * per_page)).all()
+        payload = {'items': [_catalog_row(row) for row in rows],
+                   'total': count,
+                   'page': page,
+                   'pages': -(-count // per_page) if per_page else 0}
+        etag = f'{etag}-p{page}.{per_page}'
+    if request.if_none_match.contains(etag):
+        return Response(status=304)
+    response = Response(orjson.dumps(payload,
+                                     option=orjson.OPT_NAIVE_UTC),
+                        mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.private = True
+    return response
+
+
+@bp.route('/api/list')
+def api_list_all_parts():
+    # Cheap strong-enough validator: one index scan, no row hydration.
+    # Pollers that already hold the current catalog get a bodyless 304.
+    max_updated, count = db.session.query(
+        func.max(Parts.updated_at), func.count(Parts.part_id)).one()
+    etag = (f'{max_updated.timestamp() if max_updated else 0}'
+            f'-{count}')
+    if request.args:
+        return _paged_catalog(etag, count)
+    if request.if_none_match.contains(etag):
+        return Response(status=304)
+    # Server-side cursor + generator response: the first bytes leave
+    # before the last row is fetched and peak memory is one 1000-row
+    # batch, not the whole catalog plus its encoded JSON.
+    def generate():
+        result = db.session.execute(
+            _CATALOG_STMT.execution_options(stream_results=True,
+                                            yield_per=1000))
+        yield b'['
+        first = True
+        for row in result:
+            if first:
+                first = False
+            else:
+                yield b','
+            yield orjson.dumps(_catalog_row(row),
+                               option=orjson.OPT_NAIVE_UTC)
+        yield b']'
+    response = Response(stream_with_context(generate()),
+                        mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.private = True
+    return response
+
+
+@bp.route('/api/category/<category>')
+def api_parts_by_category(category):
+    # Versioned key: any part edit in the category bumps
+    # MAX(updated_at), and a delete drops the count, so either kind of
+    # write rolls the key and nothing needs explicit invalidation. The
+    # encoded bytes are cached, so a hit skips the query and the
+    # serialization.
+    max_updated, count = db.session.execute(
+        select(func.max(Parts.updated_at), func.count(Parts.part_id))
+        .where(Parts.category == category)).one()
+    page = request.args.get('page', type=int)
+    key = (f'parts:cat:{category}'
+           f':v{max_updated.timestamp() if max_updated else 0}-{count}')
+    if page:
+        page = max(page, 1)
+        per_page = min(request.args.get('per_page', 100, type=int),
+                       _MAX_PER_PAGE)
+        key = f'{key}:p{page}.{per_page}'
+    payload = cache.get(key)
+    if payload is None:
+        # Price joined in, so cache misses cost one statement rather
+        # than one current_price lookup per row.
+        stmt = (select(Parts, _CURRENT_PRICE.c.price)
+                .outerjoin(_CURRENT_PRICE,
+                           Parts.part_id == _CURRENT_PRICE.c.part_id)
+                .where(Parts.category == category)
+                .order_by(Parts.description, Parts.part_number))
+        if page:
+            # Explicit limit/offset like _paged_catalog: db.paginate
+            # would collapse the two-element select to scalars and drop
+            # the joined price. The aggregate above already supplies
+            # the total.
+            rows = db.session.execute(
+                stmt.limit(per_page).offset((page - 1) * per_page))
+            body = {
+                'items': [_category_row(p, price) for p, price in rows],
+                'total': count,
+                'page': page,
+                'pages': -(-count // per_page) if per_page else 0,
+            }
+        else:
+            body = [_category_row(p, price)
+                    for p, price in db.session.execute(stmt)]
+        payload = orjson.dumps(body, option=orjson.OPT_NAIVE_UTC)
+        cache.set(key, payload, timeout=300)
+    return Response(payload, mimetype='application/json')
+
+
+def _category_row(p, price):
+    return {
+        'part_id': p.part_id,
+        'model': p.model,
+        'rating': p.rating,
+        'manufacturer': p.manufacturer,
+        'part_number': p.part_number,
+        'description': p.description,
+        'current_price': float(price) if price is not None else None,
+        # Raw datetime: the orjson provider renders it in native C.
+        'updated_at': p.updated_at,
+    }
+
+
+@bp.route('/api/add', methods=['POST'])
+def api_add_database_part():
+    data = request.json or {}
+    try:
+        # Core INSERT ... RETURNING: the id comes back with the insert
+        # itself, so no separate flush round-trip and no ORM change
+        # tracking for an object nothing else reads.
+        part_id = db.session.execute(
+            insert(Parts)
+            .values(
+                category=data.get('category'),
+                model=data.get('model'),
+                rating=data.get('rating'),
+                master_item_number=data.get('master_item_number'),
+                manufacturer=data.get('manufacturer'),
+                part_number=data.get('part_number'),
+                upc=data.get('upc'),
+                description=data.get('description'),
+                vendor=data.get('vendor'),
+            )
+            .returning(Parts.part_id)).scalar_one()
+        if data.get('price') is not None:
+            db.session.execute(insert(PartsPriceHistory).values(
+                part_id=part_id,
+                new_price=float(data['price']),
+                changed_reason='Initial price',
+                is_current=True,
+            ))
+        db.session.commit()
+        return jsonify({'success': True, 'part_id': part_id})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/<int:part_id>/update', methods=['POST'])
+def api_update_database_part(part_id):
+    data = request.json or {}
+    # %-style args defer formatting until a handler consumes the
+    # record, so at INFO and above the string is never built.
+    current_app.logger.debug('Update request for part %d: %s',
+                             part_id, data)
+    part = Parts.query.get_or_404(part_id)
+    try:
+        for field in ('category', 'model', 'rating', 'master_item_number',
+                      'manufacturer', 'part_number', 'upc', 'description',
+                      'vendor'):
+            if field in data:
+                setattr(part, field, data[field])
+        if data.get('price') is not None:
+            part.update_price(float(data['price']),
+                              reason=data.get('change_reason'))
+        if data.get('effective_date'):
+            new_effective_date = datetime.strptime(
+                data['effective_date'], '%Y-%m-%d').date()
+            # Try the in-place UPDATE first; the partial is_current
+            # index makes it a one-row hit, and the rowcount tells us
+            # whether a current row existed without a prior SELECT.
+            updated = db.session.execute(
+                update(PartsPriceHistory)
+                .where(PartsPriceHistory.part_id == part_id,
+                       PartsPriceHistory.is_current.is_(True))
+                .values(effective_date=new_effective_date),
+                execution_options={'synchronize_session': False}
+            ).rowcount
+            if updated == 0:
+                db.session.add(PartsPriceHistory(
+                    part_id=part_id,
+                    new_price=0,
+                    effective_date=new_effective_date,
+                    is_current=True,
+                ))
+        part.updated_at = datetime.utcnow()
+        db.session.commit()
+        return jsonify({'success': True})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def _delete_parts(part_ids):
+    """Delete parts in one statement; the database cascades the rest.
+
+    The part FKs carry ON DELETE CASCADE (SET NULL for
+    Motor.selected_vfd_part_id), so referential cleanup happens inside
+    the one DELETE with the engine's own locking semantics.
+    """
+    return db.session.execute(
+        delete(Parts).where(Parts.part_id.in_(part_ids)),
+        execution_options={'synchronize_session': False}).rowcount
+
+
+@bp.route('/api/<int:part_id>/delete', methods=['POST'])
+def api_delete_database_part(part_id):
+    try:
+        deleted = _delete_parts([part_id])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+    if not deleted:
+        return jsonify({'success': False, 'error': 'Part not found'}), 404
+    return jsonify({'success': True})
+
+
+@bp.route('/api/bulk-delete', methods=['POST'])
+def api_bulk_delete_database_parts():
+    part_ids = (request.json or {}).get('part_ids') or []
+    if not part_ids:
+        return jsonify({'success': False,
+                        'error': 'No parts selected'}), 400
+    try:
+        deleted = _delete_parts([int(part_id) for part_id in part_ids])
+        db.session.commit()
+        return jsonify({'success': True, 'deleted_count': deleted})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/<int:part_id>/price-history')
+def parts_price_history_data(part_id):
+    part = Parts.query.get_or_404(part_id)
+    max_changed = db.session.query(
+        func.max(PartsPriceHistory.changed_at)).filter_by(
+            part_id=part_id).scalar()
+    include = request.args.get('include')
+    etag = (f'{max_changed.timestamp() if max_changed else 0}'
+            f'-{part.updated_at.timestamp() if part.updated_at else 0}'
+            f'{"-" + include if include else ""}')
+    if request.if_none_match.contains(etag):
+        return Response(status=304)
+    # Four scalars from one indexed pass instead of hydrating every
+    # history row just to min/max/avg it in Python.
+    price_min, price_max, price_avg, price_count = db.session.execute(
+        select(func.min(PartsPriceHistory.new_price),
+               func.max(PartsPriceHistory.new_price),
+               func.avg(PartsPriceHistory.new_price),
+               func.count())
+        .where(PartsPriceHistory.part_id == part_id)).one()
+    statistics = {}
+    if price_count:
+        statistics = {
+            'min': float(price_min),
+            'max': float(price_max),
+            'avg': float(price_avg),
+            'count': price_count,
+        }
+    # Full rows only when the caller renders the chart/table;
+    # ?include=stats skips them entirely.
+    detailed_history = []
+    if include is None or 'history' in include:
+        rows = db.session.execute(
+            select(PartsPriceHistory.changed_at,
+                   PartsPriceHistory.old_price,
+                   PartsPriceHistory.new_price,
+                   PartsPriceHistory.changed_reason,
+                   PartsPriceHistory.effective_date)
+            .where(PartsPriceHistory.part_id == part_id)
+            .order_by(PartsPriceHistory.changed_at)).all()
+        detailed_history = [{
+            'changed_at': changed_at,
+            'old_price': (float(old_price)
+                          if old_price is not None else None),
+            'new_price': float(new_price),
+            'changed_reason': changed_reason,
+            'effective_date': effective_date,
+        } for (changed_at, old_price, new_price, changed_reason,
+               effective_date) in rows]
+    response = jsonify({
+        'part_number': part.part_number,
+        'description': part.description,
+        'current_price': part.current_price,
+        'statistics': statistics,
+        'history': detailed_history,
+    })
+    response.set_etag(etag)
+    return response
+
+
+@bp.route('/export/csv')
+def export_database_csv():
+    # Only the one column the CSV uses, on a server-side cursor; rows
+    # arrive in partitions and each CSV member is written straight into
+    # the archive. Peak memory is one partition plus the deflate
+    # buffer; the spool only hits disk past 32 MiB of archive.
+    rows = db.session.execute(
+        select(Parts.upc)
+        .order_by(Parts.part_id)
+        .execution_options(stream_results=True, yield_per=2000))
+    spool = tempfile.SpooledTemporaryFile(max_size=32 << 20)
+    with zipfile.ZipFile(spool, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        start = 1
+        for chunk in rows.partitions(_ITEMS_PER_FILE):
+            filename = f'parts_{start}_{start + len(chunk) - 1}.csv'
+            with zip_file.open(filename, 'w') as member, \
+                    io.TextIOWrapper(member, newline='',
+                                     write_through=True) as text:
+                csv_writer = csv.writer(text)
+                csv_writer.writerow(['UPC', 'Quantity'])
+                # One C-level call for the partition instead of a
+                # Python loop of writerow calls.
+                csv_writer.writerows((upc or '', 1) for (upc,) in chunk)
+            start += len(chunk)
+    spool.seek(0)
+    # conditional=True turns on Range/If-Modified-Since handling, and
+    # once the spool has rolled over to disk the WSGI file wrapper can
+    # serve it via sendfile().
+    return send_file(
+        spool, mimetype='application/zip', as_attachment=True,
+        download_name=f'parts_export_{datetime.utcnow():%Y%m%d}.zip',
+        conditional=True)
+
+
+@bp.route('/api/assemblies-for-selection')
+def api_get_assemblies_for_selection():
+    # Columns-only three-way join: one statement, no Assembly/Estimate/
+    # Project instances and no per-row lazy loads for the names.
+    rows = db.session.execute(
+        select(Assembly.assembly_id, Assembly.assembly_name,
+               Assembly.estimate_id, Estimate.estimate_name,
+               Project.project_name, Project.client_name)
+        .select_from(Assembly)
+        .join(Estimate, Assembly.estimate_id == Estimate.estimate_id)
+        .join(Project, Estimate.project_id == Project.project_id)
+        .order_by(Assembly.assembly_name))
+    return jsonify([{
+        'assembly_id': assembly_id,
+        'assembly_name': assembly_name,
+        'estimate_id': estimate_id,
+        'estimate_name': estimate_name,
+        'project_name': project_name,
+        'client_name': client_name,
+    } for (assembly_id, assembly_name, estimate_id, estimate_name,
+           project_name, client_name) in rows])
+
+
+@bp.route('/api/component/<int:assembly_part_id>/quantity',
+          methods=['POST'])
+def update_component_quantity(assembly_part_id):
+    # Cast up front so a non-numeric payload gets the JSON 400 envelope
+    # instead of escaping as an unhandled ValueError.
+    try:
+        quantity = float((request.json or {}).get('quantity'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False,
+                        'error': 'Quantity must be positive'}), 400
+    if quantity <= 0:
+        return jsonify({'success': False,
+                        'error': 'Quantity must be positive'}), 400
+    try:
+        # Direct UPDATE ... RETURNING: no prior SELECT, no identity-map
+        # entry; existence falls out of whether a row came back.
+        # datetime.utcnow() to match the model's timestamp convention:
+        # func.now() is DB-server wall clock, which can sit behind the
+        # existing UTC stamps and stop MAX(updated_at) cache keys from
+        # rolling.
+        row = db.session.execute(
+            update(AssemblyPart)
+            .where(AssemblyPart.assembly_part_id == assembly_part_id)
+            .values(quantity=quantity, updated_at=datetime.utcnow())
+            .returning(AssemblyPart.part_id),
+            execution_options={'synchronize_session': False}).first()
+        if row is None:
+            db.session.rollback()
+            return jsonify({'success': False,
+                            'error': 'Component not found'}), 404
+        price = db.session.execute(
+            select(_CURRENT_PRICE.c.price)
+            .where(_CURRENT_PRICE.c.part_id == row.part_id)).scalar()
+        db.session.commit()
+        return jsonify({
+            'success': True,
+            'new_total': (quantity * float(price)
+                          if price is not None else None),
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,24 @@
+from flask import Blueprint, abort, render_template
+from sqlalchemy.orm import selectinload
+
+from app import db
+from app.models import Assembly, Estimate
+
+bp = Blueprint('estimates', __name__)
+
+
+@bp.route('/<int:estimate_id>')
+def detail_estimate(estimate_id):
+    # One load: the estimate's selectin assemblies relationship already
+    # arrives sorted, and chaining selectinload(components) onto it
+    # pulls every assembly's components in one IN-list query. No second
+    # assemblies query, and the heavy assembly_parts graph stays cold.
+    estimate = db.session.get(
+        Estimate, estimate_id,
+        options=(selectinload(Estimate.assemblies)
+                 .selectinload(Assembly.components),))
+    if estimate is None:
+        abort(404)
+    return render_template('estimates/detail_estimate.html',
+                           estimate=estimate,
+                           assemblies=estimate.assemblies)
@@ -0,0 +1,28 @@
+from flask import Blueprint
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+from app import db
+from app.responses import err, ok
+
+bp = Blueprint('health', __name__)
+
+
+@bp.route('/db')
+def db_health():
+    """Liveness probe plus connection-pool stats for monitoring."""
+    try:
+        db.session.execute(text('SELECT 1'))
+    except Exception as e:
+        return err(str(e), 503)
+    pool = db.engine.pool
+    # size()/overflow() only exist on QueuePool; SQLite configs run on
+    # StaticPool/NullPool and the probe must not 500 there.
+    if not isinstance(pool, QueuePool):
+        return ok(pool=type(pool).__name__)
+    return ok(
+        pool_size=pool.size(),
+        checked_out=pool.checkedout(),
+        overflow=pool.overflow(),
+        checked_in=pool.checkedin(),
+    )
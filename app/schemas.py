@@ -0,0 +1,16 @@
+"""Precompiled request-payload schemas for the JSON endpoints."""
+import msgspec
+
+
+class QuantityPayload(msgspec.Struct):
+    quantity: float
+
+
+class VersionPayload(msgspec.Struct):
+    version: str
+
+
+# Decoders are built once at import; decoding through them parses and
+# type-checks the payload in C without per-field Python work.
+QUANTITY_DECODER = msgspec.json.Decoder(QuantityPayload)
+VERSION_DECODER = msgspec.json.Decoder(VersionPayload)
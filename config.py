@@ -0,0 +1,51 @@
+import os
+
+
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///est.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Keep a warm QueuePool of server connections instead of paying
+    # TCP/auth setup per request; SQLite has no connection cost worth
+    # pooling and rejects cross-thread reuse without the connect_args.
+    if SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        SQLALCHEMY_ENGINE_OPTIONS = {
+            'connect_args': {'check_same_thread': False},
+        }
+    else:
+        SQLALCHEMY_ENGINE_OPTIONS = {
+            'pool_size': 20,
+            'max_overflow': 40,
+            'pool_recycle': 1800,
+            'pool_pre_ping': True,
+            # Reuse the most recently returned connection first so idle
+            # overflow connections age out instead of being kept warm.
+            'pool_use_lifo': True,
+            # psycopg2: batch executemany (bulk_update_mappings et al.)
+            # into multi-value statements instead of one round-trip per
+            # row.
+            'executemany_mode': 'values_plus_batch',
+            'executemany_values_page_size': 1000,
+        }
+        # Opt-in: skip the per-commit WAL fsync wait on PostgreSQL.
+        # Trades up to ~wal_writer_delay of committed work on a crash
+        # for one fewer disk wait per write request, which dominates the
+        # cost of the small multi-statement transactions the app issues.
+        if os.environ.get('ASYNC_COMMIT', '').lower() in ('1', 'true'):
+            SQLALCHEMY_ENGINE_OPTIONS['connect_args'] = {
+                'options': '-c synchronous_commit=off',
+            }
+
+    # Use RedisCache in multi-worker deployments.
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'SimpleCache')
+
+    # Transparent compression for the large JSON payloads (catalog,
+    # price history, selection lists); small responses pass through.
+    COMPRESS_MIMETYPES = ['application/json']
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIN_SIZE = 1024
+
+    # Logo sizing presets for generated documents (points).
+    LOGO_SMALL = {'width': 65, 'height': 65}
+    LOGO_LARGE = {'width': 110, 'height': 110}
@@ -0,0 +1,12 @@
+from app import create_app, db
+
+app = create_app()
+
+
+@app.shell_context_processor
+def _shell_context():
+    return {'db': db, 'pool_status': lambda: db.engine.pool.status()}
+
+
+if __name__ == '__main__':
+    app.run(debug=True)
@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import (Assembly, AssemblyPart, Estimate, Parts,
+                        PartsPriceHistory, Project)
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    CACHE_TYPE = 'NullCache'
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def sql_counter(app):
+    """Collects every SQL statement executed while the fixture is live.
+
+    Tests assert on len() to pin a per-request query budget; a new lazy
+    load in a serializer flips the bound and fails the test.
+    """
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', _record)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', _record)
+
+
+@pytest.fixture
+def seeded_assembly(app):
+    """An estimate with one assembly carrying 25 priced parts."""
+    project = Project(project_name='Proj')
+    db.session.add(project)
+    db.session.flush()
+    estimate = Estimate(project_id=project.project_id,
+                        estimate_name='Est 1')
+    db.session.add(estimate)
+    db.session.flush()
+    assembly = Assembly(estimate_id=estimate.estimate_id,
+                        assembly_name='Panel', base_name='Panel')
+    db.session.add(assembly)
+    db.session.flush()
+    for i in range(25):
+        part = Parts(model=f'M-{i}', part_number=f'PN-{i}',
+                     description=f'Part {i}')
+        db.session.add(part)
+        db.session.flush()
+        db.session.add(PartsPriceHistory(part_id=part.part_id,
+                                         new_price=10 + i,
+                                         is_current=True))
+        db.session.add(AssemblyPart(assembly_id=assembly.assembly_id,
+                                    part_id=part.part_id,
+                                    quantity=2, sort_order=i))
+    db.session.commit()
+    return assembly
@@ -0,0 +1,14 @@
+from collections import Counter
+
+from app import create_app
+
+
+def test_assembly_routes_registered_once():
+    app = create_app()
+    rules = [r for r in app.url_map.iter_rules()
+             if r.endpoint.startswith('assemblies.')]
+    counts = Counter((r.rule, tuple(sorted(r.methods))) for r in rules)
+    duplicates = {k: n for k, n in counts.items() if n > 1}
+    assert not duplicates, f'Duplicate route registrations: {duplicates}'
+    assert any(r.endpoint == 'assemblies.update_assembly_quantity'
+               for r in rules)
@@ -0,0 +1,30 @@
+from app import db
+from app.models import AssemblyPart, Parts, PartsPriceHistory
+
+
+def test_parts_by_category_paged(client, app):
+    for i in range(3):
+        db.session.add(Parts(category='VFD', model=f'M{i}',
+                             part_number=f'PN{i}',
+                             description=f'Part {i}'))
+    db.session.commit()
+    resp = client.get('/database/api/category/VFD?page=1&per_page=2')
+    assert resp.status_code == 200
+    data = resp.json
+    assert data['total'] == 3
+    assert data['pages'] == 2
+    assert len(data['items']) == 2
+    resp = client.get('/database/api/category/VFD?page=2&per_page=2')
+    assert len(resp.json['items']) == 1
+
+
+def test_delete_part_cascades_to_children(client, seeded_assembly):
+    part_id = db.session.query(Parts.part_id).order_by(
+        Parts.part_id).first()[0]
+    resp = client.post(f'/database/api/{part_id}/delete')
+    assert resp.status_code == 200
+    assert resp.json['success'] is True
+    # The FK actions must fire even on SQLite (PRAGMA foreign_keys=ON):
+    # no orphaned grid rows or price history after the delete.
+    assert AssemblyPart.query.filter_by(part_id=part_id).count() == 0
+    assert PartsPriceHistory.query.filter_by(part_id=part_id).count() == 0
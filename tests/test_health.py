@@ -0,0 +1,6 @@
+def test_db_health_does_not_crash_without_queuepool(client):
+    # The in-memory SQLite test config uses StaticPool; the probe must
+    # still answer 200 rather than tripping on QueuePool-only stats.
+    resp = client.get('/healthz/db')
+    assert resp.status_code == 200
+    assert resp.json['success'] is True
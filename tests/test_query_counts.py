@@ -0,0 +1,17 @@
+def test_list_components_query_count_is_constant(client, sql_counter,
+                                                 seeded_assembly):
+    sql_counter.clear()
+    resp = client.get(
+        f'/components/api/list/{seeded_assembly.assembly_id}')
+    assert resp.status_code == 200
+    assert len(resp.json) == 25
+    # Assembly lookup, cache stamp, grid select — independent of rows.
+    assert len(sql_counter) <= 3
+
+
+def test_list_components_rows_have_prices(client, seeded_assembly):
+    resp = client.get(
+        f'/components/api/list/{seeded_assembly.assembly_id}')
+    rows = resp.json
+    assert rows[0]['unit_price'] == 10.0
+    assert rows[0]['total_price'] == 20.0